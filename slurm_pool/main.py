@@ -1,10 +1,317 @@
+import hashlib
+import itertools
+import json
+import math
+import os
+import socket
+import string
 import subprocess
-import uuid
+import threading
 import logging
 import inspect
 import textwrap
 import warnings
-from typing import Callable, Optional
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener
+from typing import Callable, Dict, List, Optional
+
+# pid plus a monotonic counter is unique enough for default script names and avoids a urandom read per instance
+_instance_counter = itertools.count()
+
+# pools at most this large get their argument lists inlined into the generated script as an if-chain
+_INLINE_DISPATCH_MAX_TASKS = 32
+
+
+# maps (source file, qualified function name) to (source file mtime, rendered source)
+_source_cache: Dict[tuple, tuple] = {}
+
+
+def _render_task_source(func: Callable) -> str:
+    """
+    Returns the dedented source of a task function. Cached, since users driving many create_job calls with the same
+    function would otherwise pay for a source-file read plus dedent on every single submission. The cache entry is
+    guarded by the source file's mtime - plain memoization by function identity would hand out stale code after the
+    user edits the task function and re-submits.
+    """
+    filename = func.__code__.co_filename
+    mtime = os.stat(filename).st_mtime
+    key = (filename, func.__qualname__)
+    cached = _source_cache.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    source = textwrap.dedent(inspect.getsource(func))
+    _source_cache[key] = (mtime, source)
+    return source
+
+
+def _write_script(path: str, payload: str, alt_dir: Optional[str] = None, mode: int = 0o644) -> None:
+    """
+    Writes a generated file in one shot through a raw file descriptor - a single os.write instead of the buffered
+    text-mode stack. If alt_dir is given (it must live on the same filesystem as the target), the file is fully
+    written there first, hardlinked into place and the staged copy removed, so a partially written script never
+    appears under its final name. Hardlinks cannot cross filesystems, so an alt_dir on a different device is
+    ignored with a warning and the target is written directly. mode is enforced with fchmod, so re-creating a file
+    that already exists with different permissions still ends up with the requested ones.
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC
+    data = payload.encode('utf-8')
+    if alt_dir is not None:
+        target_dir = os.path.dirname(path) or '.'
+        if os.stat(alt_dir).st_dev != os.stat(target_dir).st_dev:
+            warnings.warn(f"alt_dir {alt_dir} is on a different filesystem than {target_dir} and cannot be "
+                          f"hardlinked from; writing {path} directly.")
+        else:
+            staged = os.path.join(alt_dir, os.path.basename(path))
+            fd = os.open(staged, flags, mode)
+            try:
+                os.fchmod(fd, mode)
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+            if os.path.exists(path):
+                os.remove(path)
+            os.link(staged, path)
+            os.unlink(staged)
+            return
+    fd = os.open(path, flags, mode)
+    try:
+        os.fchmod(fd, mode)
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+
+
+def _run_sbatch(commands: List[List[str]]) -> tuple:
+    """
+    Runs a batch of sbatch command lines concurrently and returns (job_ids, failures). Each sbatch client is
+    I/O-bound on the slurmctld RPC, so launching them all before waiting overlaps their latency. Every client is
+    reaped before anything is reported - a failed submission must neither discard the ids of jobs that did launch
+    nor leave later processes unwaited. failures holds one CalledProcessError per failed command, with the
+    command's stderr attached.
+    """
+    procs = [subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE) for command in commands]
+    job_ids = []
+    failures = []
+    for proc in procs:
+        stdout, stderr = proc.communicate()
+        if proc.returncode != 0:
+            failures.append(subprocess.CalledProcessError(proc.returncode, proc.args,
+                                                          output=stdout.decode(), stderr=stderr.decode()))
+        else:
+            job_ids.append(stdout.decode().strip())
+    return job_ids, failures
+
+
+# The wrapper is specialized at generation time on whether kwargs is empty - the generic version re-tested the
+# kwargs dict on every iteration even though it is invariant across the loop. Both are dedented once at import time
+# instead of on every create_python_script call.
+_WRAPPER_FUNC_CODE_NO_KWARGS = textwrap.dedent("""
+def wrapper(func, args_list, kwargs):
+    for arg in args_list:
+        func(arg)
+""")
+
+_WRAPPER_FUNC_CODE_KWARGS = textwrap.dedent("""
+def wrapper(func, args_list, kwargs):
+    _call = func
+    _kw = kwargs
+    for arg in args_list:
+        _call(arg, **_kw)
+""")
+
+# Parallel variant used when cpus_per_task > 1: one array element fans its argument chunk out over a process pool
+# sized to its allocation instead of leaving all but one core idle. The task function lives at module scope in the
+# generated script, so Pool.map can pickle it by name.
+_WRAPPER_FUNC_CODE_POOL = string.Template(textwrap.dedent("""
+from functools import partial
+from multiprocessing import Pool
+
+def wrapper(func, args_list, kwargs):
+    _call = partial(func, **kwargs) if kwargs else func
+    with Pool(${cpus_per_task}) as pool:
+        pool.map(_call, args_list)
+"""))
+
+# Cached variant used with cache_dir: each argument is keyed by function source, argument and kwargs, and skipped
+# when its sentinel already exists - re-running a partially failed or grown sweep only touches unfinished arguments.
+_WRAPPER_FUNC_CODE_CACHED = string.Template(textwrap.dedent("""
+import hashlib
+import os
+
+def wrapper(func, args_list, kwargs):
+    _call = func
+    _kw = kwargs
+    for arg in args_list:
+        key = hashlib.blake2b(repr(("${func_hash}", arg, _kw)).encode()).hexdigest()
+        sentinel = os.path.join("${cache_dir}", key + ".done")
+        if os.path.exists(sentinel):
+            continue
+        ${call_code}
+        with open(sentinel, "w"):
+            pass
+"""))
+
+# Cached and parallel combined: uncached arguments are fanned out over the pool, each leaving its sentinel behind.
+_WRAPPER_FUNC_CODE_CACHED_POOL = string.Template(textwrap.dedent("""
+import hashlib
+import os
+from functools import partial
+from multiprocessing import Pool
+
+def _sentinel_path(arg, kwargs):
+    key = hashlib.blake2b(repr(("${func_hash}", arg, kwargs)).encode()).hexdigest()
+    return os.path.join("${cache_dir}", key + ".done")
+
+def _run_one(arg, func, kwargs):
+    if kwargs:
+        func(arg, **kwargs)
+    else:
+        func(arg)
+    with open(_sentinel_path(arg, kwargs), "w"):
+        pass
+
+def wrapper(func, args_list, kwargs):
+    pending = [arg for arg in args_list if not os.path.exists(_sentinel_path(arg, kwargs))]
+    with Pool(${cpus_per_task}) as pool:
+        pool.map(partial(_run_one, func=func, kwargs=kwargs), pending)
+"""))
+
+# The script bodies are compiled into string.Templates once at import time - rebuilding them per call paid for a
+# dedent regex pass plus full string assembly on every job creation. Only the ${...} placeholders vary per job;
+# literal shell dollars are escaped as $$.
+_SLURM_SCRIPT_TEMPLATE = string.Template(textwrap.dedent("""\
+#!/bin/bash
+
+## add additional SBATCH directives here
+#SBATCH --partition=${partition}
+#SBATCH --job-name=${job_name}
+#SBATCH --output=${output}
+#SBATCH --time=${time_limit}
+#SBATCH --mem=${mem_limit}
+#SBATCH --cpus-per-task=${cpus_per_task}
+#SBATCH --ntasks=1
+#SBATCH --mail-type=FAIL
+#SBATCH --mail-user=${email}
+#SBATCH --array=${array_spec}
+
+# load modules, adjust to your needs
+ml devel
+ml python/3.9.0
+
+# execute the Python code, this should stay as is.
+# --ntasks=1 --exclusive on the srun keeps SLURM from replicating the step across duplicate tasks,
+# which would double the compute and corrupt the output on some cluster configurations.
+# TASK_OFFSET is exported by split submissions (arrays larger than MaxArraySize); each chunk runs
+# as a 0-based array and the offset recovers the task id.
+srun --exclusive --ntasks=1 --cpus-per-task=${cpus_per_task} python3 ${python_script_name} $$(($${TASK_OFFSET:-0} + $${SLURM_ARRAY_TASK_ID}))
+"""))
+
+_PYTHON_SCRIPT_TEMPLATE = string.Template("""
+import json
+import sys
+import logging
+
+${task_func_code}
+
+${wrapper_func_code}
+
+if __name__ == '__main__':
+    task_id = int(sys.argv[1])
+    with open(__file__ + ".data.json") as f:
+        _data = json.load(f)
+    kwargs = _data["kwargs"]
+    ${args_dispatch_code}
+    if not args_list:
+        raise ValueError(f"No arguments found for task_id {task_id}.")
+
+    ${logging_setup_code}
+    logging.info(f"Task {task_id}: Processing arguments {args_list} with kwargs {kwargs}")
+
+    # Here, we're calling the wrapper function, passing in the task function, arguments, and kwargs for this task
+    wrapper(${task_function_name}, args_list, kwargs)
+    logging.info(f"Task {task_id}: finished successfully.")
+""")
+
+_PERSISTENT_SCRIPT_TEMPLATE = string.Template("""
+import json
+import sys
+import logging
+from multiprocessing.connection import Client
+
+${task_func_code}
+
+${process_func_code}
+
+if __name__ == '__main__':
+    task_id = int(sys.argv[1])
+    with open(__file__ + ".data.json") as f:
+        _data = json.load(f)
+    kwargs = _data["kwargs"]
+
+    ${logging_setup_code}
+    logging.info(f"Task {task_id}: connecting to dispatcher at {tuple(_data['address'])}")
+
+    conn = Client(tuple(_data["address"]), authkey=bytes.fromhex(_data["authkey"]))
+    processed = 0
+    ${pull_loop_code}
+    conn.close()
+    logging.info(f"Task {task_id}: finished successfully after processing {processed} arguments.")
+""")
+
+# Pull loops substituted into the persistent template's __main__ block; continuation lines carry its
+# 4-space indentation.
+_PERSISTENT_PULL_LOOP_SERIAL = (
+    'while True:\n'
+    '        conn.send("READY")\n'
+    '        arg = conn.recv()\n'
+    '        if arg is None:\n'
+    '            break\n'
+    '        _process(arg)\n'
+    '        processed += 1')
+
+# Parallel pull loop used when cpus_per_task > 1: arguments are fanned out over a process pool sized to the
+# element's allocation. At most cpus_per_task results are outstanding - the loop blocks on the oldest before
+# pulling again, so one element never drains the dispatcher ahead of what its cores can chew through, and
+# .get() re-raises worker exceptions like the serial loop would.
+_PERSISTENT_PULL_LOOP_POOL = string.Template(
+    'from multiprocessing import Pool\n'
+    '    with Pool(${cpus_per_task}) as pool:\n'
+    '        pending = []\n'
+    '        while True:\n'
+    '            conn.send("READY")\n'
+    '            arg = conn.recv()\n'
+    '            if arg is None:\n'
+    '                break\n'
+    '            pending.append(pool.apply_async(_process, (arg,)))\n'
+    '            if len(pending) >= ${cpus_per_task}:\n'
+    '                pending.pop(0).get()\n'
+    '                processed += 1\n'
+    '        for _res in pending:\n'
+    '            _res.get()\n'
+    '            processed += 1')
+
+# Per-argument body for the persistent worker's pull loop, specialized at generation time like the batch
+# wrappers. kwargs is a module global by the time the loop runs, so _process stays picklable by name.
+_PERSISTENT_PROCESS_CODE = string.Template(textwrap.dedent("""
+def _process(arg):
+    ${call}
+"""))
+
+# Cached variant: same key scheme as _WRAPPER_FUNC_CODE_CACHED, so persistent and batch runs of the same
+# function share cache entries.
+_PERSISTENT_PROCESS_CODE_CACHED = string.Template(textwrap.dedent("""
+import hashlib
+import os
+
+def _process(arg):
+    key = hashlib.blake2b(repr(("${func_hash}", arg, kwargs)).encode()).hexdigest()
+    sentinel = os.path.join("${cache_dir}", key + ".done")
+    if os.path.exists(sentinel):
+        return
+    ${call}
+    with open(sentinel, "w"):
+        pass
+"""))
 
 
 class SlurmMultiNodePool:
@@ -19,6 +326,14 @@ class SlurmMultiNodePool:
                  python_script_name: Optional[str] = None,
                  slurm_script_name: Optional[str] = None,
                  cpus_per_task: int = 1,
+                 batch_size: Optional[int] = None,
+                 max_array_size: int = 1001,
+                 alt_dir: Optional[str] = None,
+                 max_concurrent: Optional[int] = None,
+                 persistent: bool = False,
+                 stream_logs: bool = False,
+                 cache_dir: Optional[str] = None,
+                 inputs: Optional[Dict[int, List[str]]] = None,
                  ):
         """
         :param num_tasks: the number of tasks to be run on the cluster
@@ -30,6 +345,38 @@ class SlurmMultiNodePool:
         :param partition: the partition to which the job will be submitted - e.g. normal, owners,...
         :param python_script_name: the name of the python script that will be created. If None, a random name will be
             generated.
+        :param batch_size: if set, arguments are folded into fewer array elements, each array element processing up to
+            batch_size consecutive arguments. This overrides num_tasks and is the way to run parameter sweeps that are
+            larger than what the cluster allows as array size (see max_array_size). If None, the arguments are evenly
+            distributed over num_tasks array elements as before.
+        :param max_array_size: the cluster's SLURM MaxArraySize setting (often 1001), which caps the highest array
+            index a submission may use. If the job needs more array elements than this, it is split into multiple
+            0-based sbatch submissions whose exported TASK_OFFSET shifts the task ids of each chunk.
+        :param alt_dir: optional staging directory on the same filesystem as the working directory. Generated files
+            are fully written there first and then hardlinked into their final location, so a half-written script
+            never appears under its final name (e.g. for tooling that watches the output directory). A directory on
+            a different filesystem cannot be hardlinked from and is ignored with a warning.
+        :param max_concurrent: optional cap on how many array elements may run at the same time, emitted as the %
+            suffix of the --array directive (e.g. --array=0-999%256). Useful on clusters with per-user concurrency
+            limits, where letting the controller churn through thousands of pending tasks slows everyone down.
+        :param persistent: if True, the array elements become persistent workers that connect back over TCP to the
+            submitting process and pull arguments one at a time until the pool is drained, instead of each element
+            working through a statically assigned argument slice. Faster workers automatically pick up more work,
+            and short task functions are not dominated by static load imbalance. NOTE the submitting process must
+            stay alive until all workers have finished, since it acts as the dispatcher.
+        :param stream_logs: if True, the workers send their log records over TCP to an aggregator in the submitting
+            process, which appends them all to a single {log_directory}/{job_name}.log file. SLURM's own per-task
+            output goes to /dev/null. This avoids creating one small log file per array element on the parallel
+            filesystem. As with persistent, the submitting process must stay alive while workers run.
+        :param cache_dir: optional directory for a content-addressed result cache. Each processed argument leaves a
+            sentinel keyed by the task function's source, the argument and the kwargs; re-submitting the same (or a
+            grown) sweep skips arguments that already completed, so recovering from partial failures only costs the
+            unfinished work.
+        :param inputs: optional mapping from task id to input files that the task function needs. The files are
+            pre-staged (zero-copy via os.sendfile) into a {job_name}_inputs directory next to the generated scripts
+            before any script is written, and arguments equal to a source path are rewritten to point at the staged
+            copy. The staged paths are also recorded per task in the JSON sidecar. The staging directory must be
+            reachable from the compute nodes, which is why it sits beside the scripts on the shared filesystem.
         """
 
         self.num_tasks = num_tasks
@@ -39,7 +386,7 @@ class SlurmMultiNodePool:
         self.mem_limit = mem_limit
         self.email = email
         self.partition = partition
-        uid = uuid.uuid4()
+        uid = f"{os.getpid()}-{next(_instance_counter)}"
         if slurm_script_name is None:
             slurm_script_name = f"{job_name}_{uid}.slurm"
         self.slurm_script_name = slurm_script_name
@@ -47,9 +394,28 @@ class SlurmMultiNodePool:
             python_script_name = f"{job_name}_{uid}.py"
         self.python_script_name = python_script_name
         self.cpus_per_task = cpus_per_task
+        self.batch_size = batch_size
+        self.max_array_size = max_array_size
+        self.alt_dir = alt_dir
+        self.max_concurrent = max_concurrent
+        self.persistent = persistent
+        self.stream_logs = stream_logs
+        self.cache_dir = cache_dir
+        self.inputs = inputs
+
+        self.job_ids = []  # job ids returned by sbatch --parsable, for later squeue/sacct polling
 
         self._task_function = None
-        self._task2args_map = None
+        self._dispatcher = None  # Listener serving arguments to persistent workers
+        self._dispatcher_thread = None
+        self._dispatch_authkey = None
+        self._log_server = None  # Listener aggregating worker log lines into a single file
+        self._log_thread = None
+        self._log_authkey = None
+        self._staged_inputs = None  # per-task staged copies of the input files
+        self._flat_args = None  # all arguments, stored once as a flat list
+        self._task_slices = None  # per-task (start, stride) or (offset, length) descriptors into _flat_args
+        self._chunked = False
         self._kwargs = None  # Initialize an attribute to store kwargs
 
     def create_python_script(self) -> None:
@@ -60,50 +426,269 @@ class SlurmMultiNodePool:
         """
         if not self._task_function:
             raise ValueError("Task function not set. Use the set_task_function method to set it.")
-        if not self._task2args_map:
+        if self._task_slices is None:
             raise ValueError("Arguments mapping not set. Please ensure you run _create_task2args_mapping before "
                              "creating the script.")
 
         # Convert the functions to a string of Python code
-        task_func_code = textwrap.dedent(inspect.getsource(self._task_function))
-        wrapper_func_code = textwrap.dedent("""
-def wrapper(func, args_list, kwargs):
-    for arg in args_list:
-        if kwargs:
-            func(arg, **kwargs)
+        task_func_code = _render_task_source(self._task_function)
+        if self.stream_logs:
+            self._start_log_aggregator()
+
+        if self.persistent:
+            self._create_persistent_worker_script(task_func_code)
+            return
+
+        # pick the wrapper matching the shapes known at generation time: result caching, whether the array
+        # element's allocation has more than one core to fan out over, and whether kwargs is empty
+        parallel = self.cpus_per_task > 1
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            func_hash = hashlib.blake2b(task_func_code.encode()).hexdigest()[:16]
+            if parallel:
+                wrapper_func_code = _WRAPPER_FUNC_CODE_CACHED_POOL.substitute(
+                    func_hash=func_hash, cache_dir=self.cache_dir, cpus_per_task=self.cpus_per_task)
+            else:
+                wrapper_func_code = _WRAPPER_FUNC_CODE_CACHED.substitute(
+                    func_hash=func_hash, cache_dir=self.cache_dir,
+                    call_code="_call(arg, **_kw)" if self._kwargs else "_call(arg)")
+        elif parallel:
+            wrapper_func_code = _WRAPPER_FUNC_CODE_POOL.substitute(cpus_per_task=self.cpus_per_task)
         else:
-            func(arg)
-""")
-        # Generate the code to include kwargs
-        kwargs_code = f"kwargs = {self._kwargs}"
-
-        # Make sure to include wrapper function and any imports it needs
-        python_code = f"""
-import sys
-import logging
-
-{task_func_code}
-
-{wrapper_func_code}
-
-if __name__ == '__main__':
-    task_id = int(sys.argv[1])
-    {kwargs_code}
-    mapping = {self._task2args_map}
-    args_list = mapping.get(task_id, [])
-    if not args_list:
-        raise ValueError(f"No arguments found for task_id {{task_id}}.")
+            wrapper_func_code = _WRAPPER_FUNC_CODE_KWARGS if self._kwargs else _WRAPPER_FUNC_CODE_NO_KWARGS
+
+        # For anything beyond a small pool, the arguments go into a JSON sidecar next to the script rather than
+        # being repr'd into the source - this keeps the generated script O(1) in size (no multi-MB literal for the
+        # worker's Python to re-compile). The arguments are stored once as a flat list plus one slice descriptor
+        # per task, so the sidecar holds len(args) values instead of num_tasks sub-lists. Small pools skip the
+        # sidecar arrays entirely and get their argument lists inlined (see _args_dispatch_code).
+        sidecar = {"kwargs": self._kwargs}
+        if self.num_tasks > _INLINE_DISPATCH_MAX_TASKS:
+            sidecar["flat"] = self._flat_args
+            sidecar["slices"] = {str(k): v for k, v in self._task_slices.items()}
+            sidecar["chunked"] = self._chunked
+        if self.stream_logs:
+            sidecar["log_address"] = list(self._log_server.address)
+            sidecar["log_authkey"] = self._log_authkey.hex()
+        if self._staged_inputs:
+            sidecar["inputs"] = {str(k): v for k, v in self._staged_inputs.items()}
+        # sidecars are owner-only: they can carry connection secrets (dispatcher/log-aggregator authkeys) and the
+        # workers run as the submitting user anyway
+        _write_script(self.python_script_name + ".data.json", json.dumps(sidecar), self.alt_dir, mode=0o600)
+
+        python_code = _PYTHON_SCRIPT_TEMPLATE.substitute(
+            task_func_code=task_func_code,
+            wrapper_func_code=wrapper_func_code,
+            args_dispatch_code=self._args_dispatch_code(),
+            logging_setup_code=self._logging_setup_code(),
+            task_function_name=self._task_function.__name__,
+        )
+        _write_script(self.python_script_name, python_code, self.alt_dir)
+        logging.info(f"Python script {self.python_script_name} created.")
 
-    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
-    logging.info(f"Task {{task_id}}: Processing arguments {{args_list}} with kwargs {{kwargs}}")
+    def _create_persistent_worker_script(self, task_func_code: str) -> None:
+        """
+        Creates the persistent-worker variant of the python script. Each array element connects back to the
+        dispatcher in the submitting process and pulls arguments one at a time, so interpreter startup is paid once
+        per worker rather than once per argument and fast workers automatically drain more of the pool.
+        """
+        self._start_dispatcher()
+        host, port = self._dispatcher.address
+        sidecar = {"kwargs": self._kwargs,
+                   "address": [host, port],
+                   "authkey": self._dispatch_authkey.hex()}
+        if self.stream_logs:
+            sidecar["log_address"] = list(self._log_server.address)
+            sidecar["log_authkey"] = self._log_authkey.hex()
+        if self._staged_inputs:
+            sidecar["inputs"] = {str(k): v for k, v in self._staged_inputs.items()}
+        # owner-only: the sidecar carries the dispatcher authkey, which must not be readable by other cluster users
+        _write_script(self.python_script_name + ".data.json", json.dumps(sidecar), self.alt_dir, mode=0o600)
+
+        # specialize the per-argument body on whether kwargs is empty and whether results are cached,
+        # same as the batch wrapper
+        if self._kwargs:
+            call = f"{self._task_function.__name__}(arg, **kwargs)"
+        else:
+            call = f"{self._task_function.__name__}(arg)"
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            func_hash = hashlib.blake2b(task_func_code.encode()).hexdigest()[:16]
+            process_func_code = _PERSISTENT_PROCESS_CODE_CACHED.substitute(
+                func_hash=func_hash, cache_dir=self.cache_dir, call=call)
+        else:
+            process_func_code = _PERSISTENT_PROCESS_CODE.substitute(call=call)
 
-    # Here, we're calling the wrapper function, passing in the task function, arguments, and kwargs for this task
-    wrapper({self._task_function.__name__}, args_list, kwargs)
-    logging.info(f"Task {{task_id}}: finished successfully.")
-"""
-        with open(self.python_script_name, 'w') as script_file:
-            script_file.write(python_code)
-        logging.info(f"Python script {self.python_script_name} created.")
+        # with more than one core per element, the pull loop fans out over a pool instead of leaving the
+        # extra cores idle; _process is module-scope, so the pool can pickle it by name
+        if self.cpus_per_task > 1:
+            pull_loop_code = _PERSISTENT_PULL_LOOP_POOL.substitute(cpus_per_task=self.cpus_per_task)
+        else:
+            pull_loop_code = _PERSISTENT_PULL_LOOP_SERIAL
+
+        python_code = _PERSISTENT_SCRIPT_TEMPLATE.substitute(
+            task_func_code=task_func_code,
+            logging_setup_code=self._logging_setup_code(),
+            process_func_code=process_func_code,
+            pull_loop_code=pull_loop_code,
+        )
+        _write_script(self.python_script_name, python_code, self.alt_dir)
+        logging.info(f"Persistent worker script {self.python_script_name} created.")
+
+    def _start_dispatcher(self) -> None:
+        """
+        Binds a TCP listener on the submitting host and starts a background thread that hands out arguments to the
+        persistent workers. Whichever worker asks next receives the next argument, and a None sentinel once the
+        pool is drained, so the distribution is dynamic rather than a static per-task split.
+        """
+        self._dispatch_authkey = os.urandom(16)
+        self._dispatcher = Listener((socket.gethostname(), 0), authkey=self._dispatch_authkey)
+        args_iter = iter(self._flat_args)
+        lock = threading.Lock()
+
+        def handle(conn):
+            with conn:
+                while True:
+                    try:
+                        conn.recv()
+                    except EOFError:
+                        break
+                    with lock:
+                        arg = next(args_iter, None)
+                    conn.send(arg)
+                    if arg is None:
+                        break
+
+        def dispatch():
+            handlers = []
+            for _ in range(self.num_tasks):
+                conn = self._dispatcher.accept()
+                handler = threading.Thread(target=handle, args=(conn,), daemon=True)
+                handler.start()
+                handlers.append(handler)
+            for handler in handlers:
+                handler.join()
+            self._dispatcher.close()
+
+        self._dispatcher_thread = threading.Thread(target=dispatch, daemon=True)
+        self._dispatcher_thread.start()
+
+    def _stage_inputs(self) -> None:
+        """
+        Copies the per-task input files into the staging directory with os.sendfile - a single-syscall kernel-space
+        copy per file, no userspace buffering - rewrites arguments that reference a source path to the staged copy,
+        and records the staged paths per task for the sidecar. The staging directory deliberately lives next to the
+        generated scripts (i.e. on the shared filesystem): the rewritten paths must resolve on the compute nodes,
+        so node-local locations like alt_dir are not usable here. Staged names are prefixed with a hash of the
+        full source path - distinct inputs that share a basename (runA/data.txt, runB/data.txt) must not collide
+        in the flat staging directory.
+        """
+        dest_dir = f"{self.job_name}_inputs"
+        os.makedirs(dest_dir, exist_ok=True)
+        staged = {}
+        self._staged_inputs = {}
+        for task_id, paths in self.inputs.items():
+            for src in paths:
+                if src not in staged:
+                    prefix = hashlib.blake2b(os.path.abspath(src).encode()).hexdigest()[:12]
+                    dst = os.path.join(dest_dir, f"{prefix}-{os.path.basename(src)}")
+                    src_fd = os.open(src, os.O_RDONLY)
+                    try:
+                        dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                        try:
+                            remaining = os.fstat(src_fd).st_size
+                            offset = 0
+                            while remaining > 0:
+                                sent = os.sendfile(dst_fd, src_fd, offset, remaining)
+                                offset += sent
+                                remaining -= sent
+                        finally:
+                            os.close(dst_fd)
+                    finally:
+                        os.close(src_fd)
+                    staged[src] = dst
+            self._staged_inputs[task_id] = [staged[src] for src in paths]
+        # arguments that pointed at a source file now point at its staged copy
+        self._flat_args = [staged.get(arg, arg) if isinstance(arg, str) else arg for arg in self._flat_args]
+        logging.info(f"Staged {len(staged)} input files into {dest_dir}.")
+
+    def _args_dispatch_code(self) -> str:
+        # emitted into the generated script's __main__ block; continuation lines carry its 4-space indentation.
+        # Small pools dispatch through an if-chain of integer compares with the argument lists inlined - no sidecar
+        # arrays to load and no dict round-trip at startup. Larger pools slice the sidecar's flat argument list.
+        if self.num_tasks <= _INLINE_DISPATCH_MAX_TASKS:
+            branches = []
+            for i in range(self.num_tasks):
+                start, extent = self._task_slices[i]
+                args_list = self._flat_args[start:start + extent] if self._chunked else self._flat_args[start::extent]
+                branches.append(f"{'if' if i == 0 else 'elif'} task_id == {i}:\n        args_list = {args_list!r}")
+            branches.append('else:\n        raise ValueError(f"No arguments found for task_id {task_id}.")')
+            return "\n    ".join(branches)
+        return ('_slice = _data["slices"].get(str(task_id))\n'
+                '    if _slice is None:\n'
+                '        raise ValueError(f"No arguments found for task_id {task_id}.")\n'
+                '    flat = _data["flat"]\n'
+                '    if _data["chunked"]:\n'
+                '        args_list = flat[_slice[0]:_slice[0] + _slice[1]]\n'
+                '    else:\n'
+                '        args_list = flat[_slice[0]::_slice[1]]')
+
+    def _logging_setup_code(self) -> str:
+        # emitted into the generated script's __main__ block; continuation lines carry its 4-space indentation.
+        # The streaming variant authenticates against the aggregator with the sidecar's authkey and forwards
+        # pre-formatted lines - no pickled log records cross the wire.
+        if self.stream_logs:
+            return ('from multiprocessing.connection import Client as _LogClient\n'
+                    '    class _ForwardingHandler(logging.Handler):\n'
+                    '        def __init__(self, conn):\n'
+                    '            logging.Handler.__init__(self)\n'
+                    '            self._conn = conn\n'
+                    '        def emit(self, record):\n'
+                    '            self._conn.send(self.format(record))\n'
+                    '    _log_conn = _LogClient(tuple(_data["log_address"]), authkey=bytes.fromhex(_data["log_authkey"]))\n'
+                    '    _log_handler = _ForwardingHandler(_log_conn)\n'
+                    "    _log_handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))\n"
+                    '    logging.getLogger().setLevel(logging.INFO)\n'
+                    '    logging.getLogger().addHandler(_log_handler)')
+        return "logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')"
+
+    def _start_log_aggregator(self) -> None:
+        """
+        Starts a TCP listener on the submitting host that collects the workers' formatted log lines and appends
+        them to a single {log_dir}/{job_name}.log file. One sequentially-appended file replaces one small log file
+        per array element, which is what the per-task SLURM output files would otherwise cost the parallel
+        filesystem. The listener runs the same authkey challenge-response handshake as the dispatcher, so a random
+        process that can reach the port can neither inject log lines nor feed the aggregator hostile payloads.
+        """
+        os.makedirs(self.log_dir, exist_ok=True)
+        log_file = open(os.path.join(self.log_dir, f"{self.job_name}.log"), 'a')
+        lock = threading.Lock()
+        self._log_authkey = os.urandom(16)
+        self._log_server = Listener((socket.gethostname(), 0), authkey=self._log_authkey)
+
+        def handle(conn):
+            with conn:
+                while True:
+                    try:
+                        line = conn.recv()
+                    except EOFError:
+                        break
+                    with lock:
+                        log_file.write(str(line) + '\n')
+                        log_file.flush()
+
+        def serve():
+            while True:
+                try:
+                    conn = self._log_server.accept()
+                except AuthenticationError:
+                    continue
+                except OSError:
+                    break
+                threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+        self._log_thread = threading.Thread(target=serve, daemon=True)
+        self._log_thread.start()
 
     def create_slurm_script(self) -> None:
         """
@@ -111,32 +696,25 @@ if __name__ == '__main__':
 
         :return: None
         """
-        array_upper_limit = self.num_tasks - 1
-        slurm_commands = textwrap.dedent(f"""\
-        #!/bin/bash
-
-        ## add additional SBATCH directives here
-        #SBATCH --partition={self.partition}
-        #SBATCH --job-name={self.job_name}
-        #SBATCH --output={self.log_dir}/%j.log
-        #SBATCH --time={self.time_limit}
-        #SBATCH --mem={self.mem_limit}
-        #SBATCH --cpus-per-task={self.cpus_per_task}
-        #SBATCH --mail-type=FAIL
-        #SBATCH --mail-user={self.email}
-        #SBATCH --array=0-{array_upper_limit}
-
-        # load modules, adjust to your needs
-        ml devel
-        ml python/3.9.0
-
-        # execute the Python code, this should stay as is.
-        python3 {self.python_script_name} ${{SLURM_ARRAY_TASK_ID}}
-        """)
-        # The rest of your code to write slurm_commands to a file would go here
-
-        with open(self.slurm_script_name, 'w') as script_file:
-            script_file.write(slurm_commands)
+        # the directive never exceeds index max_array_size - 1; larger jobs are split by submit_job into 0-based
+        # chunks whose TASK_OFFSET export shifts the ids, so the script stays valid for manual sbatch use too
+        array_spec = f"0-{min(self.num_tasks, self.max_array_size) - 1}"
+        if self.max_concurrent is not None:
+            array_spec += f"%{self.max_concurrent}"
+        # with streamed logs everything goes through the aggregator, so SLURM's own per-task files are suppressed
+        output = '/dev/null' if self.stream_logs else f'{self.log_dir}/%j.log'
+        slurm_commands = _SLURM_SCRIPT_TEMPLATE.substitute(
+            partition=self.partition,
+            job_name=self.job_name,
+            output=output,
+            time_limit=self.time_limit,
+            mem_limit=self.mem_limit,
+            cpus_per_task=self.cpus_per_task,
+            email=self.email,
+            array_spec=array_spec,
+            python_script_name=self.python_script_name,
+        )
+        _write_script(self.slurm_script_name, slurm_commands, self.alt_dir)
         logging.info(f"SLURM script {self.slurm_script_name} created.")
 
     def submit_job(self) -> None:
@@ -147,8 +725,41 @@ if __name__ == '__main__':
 
         :return: None
         """
-        subprocess.run(['sbatch', self.slurm_script_name], check=True)
-        logging.info(f"Job {self.job_name} submitted.")
+        if self.num_tasks > self.max_array_size:
+            # MaxArraySize caps the highest usable array *index* (index must be < MaxArraySize), not the number of
+            # elements per submission, so a range like 1001-2000 would be rejected outright. Each chunk is
+            # therefore submitted as a 0-based array (the --array option on the command line overrides the
+            # directive in the script) and the chunk's base offset is exported as TASK_OFFSET, which the srun line
+            # adds to SLURM_ARRAY_TASK_ID to recover the real task id.
+            concurrency = f"%{self.max_concurrent}" if self.max_concurrent is not None else ""
+            commands = []
+            for start in range(0, self.num_tasks, self.max_array_size):
+                count = min(self.max_array_size, self.num_tasks - start)
+                commands.append(['sbatch', '--parsable', f'--array=0-{count - 1}{concurrency}',
+                                 f'--export=ALL,TASK_OFFSET={start}', self.slurm_script_name])
+        else:
+            commands = [['sbatch', '--parsable', self.slurm_script_name]]
+        job_ids, failures = _run_sbatch(commands)
+        # record whatever did launch even if a later chunk failed, so the caller can still poll or scancel it
+        self.job_ids = job_ids
+        if failures:
+            raise failures[0]
+        logging.info(f"Job {self.job_name} submitted (job ids: {', '.join(self.job_ids)}).")
+
+    def submit_jobs(self, slurm_script_names: List[str]) -> List[str]:
+        """
+        Submits several already-created SLURM scripts in one go and returns their job ids. The sbatch clients are
+        launched concurrently and collected afterwards - they spend their time waiting on the controller RPC, so
+        this costs one round of fork/exec latency instead of one per script.
+
+        :param slurm_script_names: the SLURM script files to submit
+        :return: the job ids reported by sbatch --parsable, in the same order as the scripts
+        """
+        job_ids, failures = _run_sbatch([['sbatch', '--parsable', name] for name in slurm_script_names])
+        if failures:
+            raise failures[0]
+        logging.info(f"{len(job_ids)} jobs submitted (job ids: {', '.join(job_ids)}).")
+        return job_ids
 
     def create_job(self, task_function: Callable, *args, **kwargs) -> None:
         """
@@ -160,6 +771,8 @@ if __name__ == '__main__':
         self._task_function = task_function
         self._kwargs = kwargs  # Store kwargs to use in the script
         self._create_task2args_mapping(*args)
+        if self.inputs:
+            self._stage_inputs()
         self.create_python_script()
         self.create_slurm_script()
 
@@ -201,15 +814,45 @@ if __name__ == '__main__':
         self.create_submit_job(task_function, *args, **kwargs)
 
     def _create_task2args_mapping(self, *args):
-        mapping = {}
+        # a zero-argument job has nothing to distribute; the chunk math below would divide by zero and the
+        # generated dispatch code would be empty, so reject it with an intelligible error instead
+        if not args:
+            raise ValueError("At least one argument is required to create a job.")
+        # fail fast on arguments that cannot be shipped to the cluster - catching this here costs one local pass
+        # over the arguments, whereas a worker that only blows up at startup has already been charged queue time.
+        # The same pass round-trips every argument through JSON, so inline dispatch (repr), the sidecar (JSON)
+        # and the persistent dispatcher (pickle) all deliver identically shaped values - without it, a tuple
+        # argument would arrive as a tuple or a list depending on the pool size, and the cached wrappers' repr
+        # keys would differ across dispatch modes for the same argument
+        normalized = []
+        for i, arg in enumerate(args):
+            try:
+                normalized.append(json.loads(json.dumps(arg)))
+            except (TypeError, ValueError) as e:
+                raise TypeError(f"Argument {i} of type {type(arg)} is not JSON-serializable. Arguments must be "
+                                f"primitive data types (see the create_submit_job docstring).") from e
+        # the arguments are kept once as a flat list plus one O(1) slice descriptor per task - materializing
+        # num_tasks sub-lists would duplicate the whole argument set in memory and in the sidecar
+        self._flat_args = normalized
+        if self.batch_size is not None:
+            # fold batch_size consecutive arguments into each array element - chunked rather than strided, so that
+            # functions reading adjacent inputs keep their locality
+            self.num_tasks = math.ceil(len(args) / self.batch_size)
+            self._chunked = True
+            self._task_slices = {i: (i * self.batch_size, min(self.batch_size, len(args) - i * self.batch_size))
+                                 for i in range(self.num_tasks)}
+            return
         if len(args) < self.num_tasks:
             warnings.warn(
                 f"Number of arguments ({len(args)}) should be at least the number of tasks ({self.num_tasks})."
                 f" To avoid spawning empty tasks, the number of tasks will automatically be reduced to the "
                 f"number of arguments.")
             self.num_tasks = len(args)
-        # evenly distribute the arguments to the tasks
-        for i in range(self.num_tasks):
-            mapping[i] = args[i::self.num_tasks]
-        self._task2args_map = mapping
+        # evenly distribute the arguments to the tasks as contiguous chunks - unlike the previous strided split,
+        # growing a sweep keeps earlier arguments on the same tasks, so the result cache stays warm across re-runs
+        chunk = math.ceil(len(args) / self.num_tasks)
+        self.num_tasks = math.ceil(len(args) / chunk)
+        self._chunked = True
+        self._task_slices = {i: (i * chunk, min(chunk, len(args) - i * chunk))
+                             for i in range(self.num_tasks)}
 